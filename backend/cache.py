@@ -0,0 +1,28 @@
+import redis
+
+cache_path = "redis://{}/{}".format('localhost:6379', 0)
+
+cache = redis.Redis.from_url(cache_path, socket_connect_timeout=1)
+
+'''
+cache_get(key) / cache_set(key, value, ex) / cache_delete(*keys)
+    thin wrappers around the redis client; an unreachable redis
+    is treated as a cache miss so requests fall back to the database
+'''
+def cache_get(key):
+    try:
+        return cache.get(key)
+    except redis.RedisError:
+        return None
+
+def cache_set(key, value, ex=None):
+    try:
+        cache.set(key, value, ex=ex)
+    except redis.RedisError:
+        pass
+
+def cache_delete(*keys):
+    try:
+        cache.delete(*keys)
+    except redis.RedisError:
+        pass
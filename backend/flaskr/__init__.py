@@ -1,16 +1,75 @@
 import os
-from flask import Flask, request, abort, jsonify
+import random
+import threading
+import time
+import orjson
+from collections import OrderedDict
+from flask import Flask, Response, request, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from models import setup_db, Question, Category
+from sqlalchemy import bindparam, func
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext import baked
+from models import setup_db, db, Question, Category
+from cache import cache_get, cache_set, cache_delete
 
 QUESTIONS_PER_PAGE = 10
+CATEGORIES_CACHE_KEY = 'categories:v2'
+CATEGORIES_CACHE_TTL = 3600
+QUESTIONS_COUNT_CACHE_KEY = 'questions:count'
+QUESTIONS_COUNT_CACHE_TTL = 60
+SEARCH_INDEX_SIZE = 256
+SEARCH_INDEX_TTL = 60
+# within a single category, up to this many previous quiz questions are
+# filtered out in python rather than with a NOT IN clause; "All" (id 0)
+# always stays in SQL so it never pulls every question id into python
+QUIZ_SET_GATE_SIZE = 20
+# caches the compiled quiz queries so each request only binds parameters;
+# they read Session attributes that scoped_session does not proxy, so pass db.session()
+bakery = baked.bakery()
+# columns read by Question.format(); listings select these directly
+# so no Question entities are built per row
+QUESTION_COLUMNS = (
+  Question.id,
+  Question.question,
+  Question.answer,
+  Question.category,
+  Question.difficulty
+)
+QUESTION_FIELDS = tuple(column.key for column in QUESTION_COLUMNS)
+
+'''
+ojsonify(**kwargs)
+    builds a json response straight from orjson bytes
+    instead of going through flask's stdlib-json jsonify
+'''
+def ojsonify(**kwargs):
+  return Response(
+    orjson.dumps(kwargs, option=orjson.OPT_NON_STR_KEYS),
+    mimetype='application/json'
+  )
+
+'''
+format_questions(rows)
+    turns QUESTION_COLUMNS rows into the same dicts as Question.format(),
+    zipping each tuple with the field names instead of a per-row method call
+'''
+def format_questions(rows):
+  return [dict(zip(QUESTION_FIELDS, row)) for row in rows]
 
 def create_app(test_config=None):
   # create and configure the app
   app = Flask(__name__)
   setup_db(app)
   CORS(app, resources={r'/*': {'origins': '*'}})
+  # lower-cased search term -> (expiry, ids of matching questions).
+  # this process clears it on every add/delete; entries also expire after
+  # SEARCH_INDEX_TTL so writes made by other workers show up. the dev server
+  # is threaded, so every access goes through search_index_lock
+  search_index = OrderedDict()
+  search_index_lock = threading.Lock()
+  search_index_generation = 0
 
   @app.after_request
   def after_request(response):
@@ -18,28 +77,96 @@ def create_app(test_config=None):
     response.headers.add('Access-Control-Allow-Methods', 'GET, PATCH, POST, DELETE, OPTIONS')
     return response
 
-  def paginate_questions(request, selection):
-    questions = [question.format() for question in selection]
-    page = request.args.get('page', 1, type=int)
-    start = (page-1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
-    current_questions = questions[start:end]
+  def paginate(page, selection):
+    # slicing a query applies LIMIT/OFFSET, slicing a list stays in memory;
+    # either way only the rows on the requested page are handed back
+    start = max(page-1, 0) * QUESTIONS_PER_PAGE
+    return selection[start:start + QUESTIONS_PER_PAGE]
+
+  def paginate_questions(page, query):
+    current_questions = format_questions(paginate(page, query))
     return current_questions
 
+  def search_question_ids(search_term):
+    key = search_term.lower()
+    with search_index_lock:
+      entry = search_index.get(key)
+      if entry is not None and entry[0] > time.monotonic():
+        search_index.move_to_end(key)
+        return entry[1]
+      generation = search_index_generation
+    # escape LIKE wildcards so the term is matched as a plain substring
+    pattern = '%{}%'.format(
+      search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    )
+    selection = db.session.query(Question.id).filter(
+      Question.question.ilike(pattern, escape='\\')
+    ).order_by(Question.id)
+    question_ids = [row.id for row in selection]
+    with search_index_lock:
+      # skip storing results read before a concurrent insert/delete cleared the index
+      if generation == search_index_generation:
+        search_index[key] = (time.monotonic() + SEARCH_INDEX_TTL, question_ids)
+        search_index.move_to_end(key)
+        if len(search_index) > SEARCH_INDEX_SIZE:
+          search_index.popitem(last=False)
+    return question_ids
+
+  def clear_search_index():
+    nonlocal search_index_generation
+    with search_index_lock:
+      search_index.clear()
+      search_index_generation += 1
+
+  def cache_key(name):
+    # namespace cache entries by database so trivia and trivia_test never share them
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    return '{}:{}/{}:{}'.format(url.host or '', url.port or '', url.database or '', name)
+
+  def load_categories():
+    cached = cache_get(cache_key(CATEGORIES_CACHE_KEY))
+    if cached:
+      return orjson.loads(cached)
+    categories = dict(db.session.query(Category.id, Category.type).all())
+    cache_set(
+      cache_key(CATEGORIES_CACHE_KEY),
+      orjson.dumps(categories, option=orjson.OPT_NON_STR_KEYS),
+      ex=CATEGORIES_CACHE_TTL
+    )
+    return categories
+
+  def count_questions():
+    cached = cache_get(cache_key(QUESTIONS_COUNT_CACHE_KEY))
+    if cached is not None:
+      return int(cached)
+    total_questions = db.session.query(func.count(Question.id)).scalar()
+    cache_set(
+      cache_key(QUESTIONS_COUNT_CACHE_KEY),
+      total_questions,
+      ex=QUESTIONS_COUNT_CACHE_TTL
+    )
+    return total_questions
+
+  def load_request_body(request):
+    try:
+      body = orjson.loads(request.get_data() or b'{}')
+    except orjson.JSONDecodeError:
+      abort(400)
+    # every endpoint expects a json object; anything else is a bad request
+    if not isinstance(body, dict):
+      abort(400)
+    return body
+
   '''
   Endpoint to handle GET requests 
   for all available categories.
   '''
   @app.route('/categories')
   def retrieve_categories():
-    categories = {}
-    categories_data = Category.query.all()
-    for category in  categories_data:
-      categories[category.id] = category.type
-    return jsonify({
-      'success': True,
-      'categories': categories
-    })
+    return ojsonify(
+      success=True,
+      categories=load_categories()
+    )
 
   '''
   Endpoint to handle GET requests for questions, 
@@ -54,21 +181,22 @@ def create_app(test_config=None):
   '''
   @app.route('/questions')
   def retrieve_question():
-    categories = {}
-    categories_data = Category.query.all()
-    for category in  categories_data:
-      categories[category.id] = category.type
-    questions = Question.query.order_by('id').all()
-    current_questions = paginate_questions(request, questions)
+    page = request.args.get('page', 1, type=int)
+    categories = load_categories()
+    total_questions = count_questions()
+    current_questions = paginate_questions(
+      page,
+      db.session.query(*QUESTION_COLUMNS).order_by(Question.id)
+    )
     if (len(current_questions) == 0):
       abort(404)
-    return jsonify({
-      'success': True,
-      'total_questions': len(questions),
-      'questions': current_questions,
-      'current_category': None,
-      'categories': categories
-    })
+    return ojsonify(
+      success=True,
+      total_questions=total_questions,
+      questions=current_questions,
+      current_category=None,
+      categories=categories
+    )
 
   ''' 
   Endpoint to DELETE question using a question ID. 
@@ -78,14 +206,19 @@ def create_app(test_config=None):
   '''
   @app.route('/questions/<int:question_id>', methods=['DELETE'])
   def delete_question(question_id):
-    question = Question.query.get(question_id)
     try:
-      question.delete()
-      return jsonify({
-        'success': True
-      })
-    except:
+      deleted = Question.query.filter(Question.id == question_id).delete(
+        synchronize_session=False
+      )
+      db.session.commit()
+    except SQLAlchemyError:
+      db.session.rollback()
+      abort(422)
+    if deleted == 0:
       abort(422)
+    clear_search_index()
+    cache_delete(cache_key(QUESTIONS_COUNT_CACHE_KEY))
+    return ojsonify(success=True)
 
   '''
   Endpoint to POST a new question, 
@@ -98,20 +231,23 @@ def create_app(test_config=None):
   '''
   @app.route('/questions', methods=['POST'])
   def create_question():
+    body = load_request_body(request)
+    if not body:
+      abort(400)
+    question = Question(
+      body.get('question'),
+      body.get('answer'),
+      body.get('category'),
+      body.get('difficulty')
+    )
     try:
-      body = request.get_json()
-      question = Question(
-        body.get('question'),
-        body.get('answer'),
-        body.get('category'),
-        body.get('difficulty')
-      )
       question.insert()
-      return jsonify({
-        'success': True
-      })
-    except:
-      abort(400)
+    except SQLAlchemyError:
+      db.session.rollback()
+      abort(422)
+    clear_search_index()
+    cache_delete(cache_key(QUESTIONS_COUNT_CACHE_KEY))
+    return ojsonify(success=True)
 
   '''
   POST endpoint to get questions based on a search term. 
@@ -124,15 +260,31 @@ def create_app(test_config=None):
   '''
   @app.route('/search', methods=['POST'])
   def search_questions():
-    search_term = request.get_json().get('searchTerm')
-    questions = Question.query.all()
-    matched_questions = [question.format() for question in questions if search_term.lower() in question.question.lower()]
-    return jsonify({
-      'success': True,
-      'questions': matched_questions,
-      'total_questions': len(matched_questions),
-      'current_category': None
-    })
+    page = request.args.get('page', 1, type=int)
+    search_term = load_request_body(request).get('searchTerm')
+    if search_term is not None and not isinstance(search_term, str):
+      abort(400)
+    if not search_term or not search_term.strip():
+      return ojsonify(
+        success=True,
+        questions=[],
+        total_questions=0,
+        current_category=None
+      )
+    question_ids = search_question_ids(search_term)
+    page_ids = paginate(page, question_ids)
+    current_questions = []
+    if page_ids:
+      selection = db.session.query(*QUESTION_COLUMNS).filter(
+        Question.id.in_(page_ids)
+      ).order_by(Question.id)
+      current_questions = format_questions(selection)
+    return ojsonify(
+      success=True,
+      questions=current_questions,
+      total_questions=len(question_ids),
+      current_category=None
+    )
 
   '''
   GET endpoint to get questions based on category. 
@@ -143,17 +295,25 @@ def create_app(test_config=None):
   '''
   @app.route('/categories/<int:category_id>/questions')
   def get_category_questions(category_id):
+    page = request.args.get('page', 1, type=int)
     category = Category.query.get(category_id)
     if (category is None):
       return abort(404)
-    questions = Question.query.filter_by(category=category_id).all()
-    current_questions = paginate_questions(request, questions)
-    return jsonify({
-      'success': True,
-      'questions': current_questions,
-      'total_questions': len(current_questions),
-      'current_category': category_id
-    })
+    total_questions = db.session.query(func.count(Question.id)).filter(
+      Question.category == category_id
+    ).scalar()
+    current_questions = paginate_questions(
+      page,
+      db.session.query(*QUESTION_COLUMNS).filter(
+        Question.category == category_id
+      ).order_by(Question.id)
+    )
+    return ojsonify(
+      success=True,
+      questions=current_questions,
+      total_questions=total_questions,
+      current_category=category_id
+    )
 
   '''
   POST endpoint to get questions to play the quiz. 
@@ -167,57 +327,70 @@ def create_app(test_config=None):
   '''
   @app.route('/quizzes', methods=['POST'])
   def get_quiz_questions():
-    data = request.get_json()
-    previous_questions = data.get('previous_questions')
+    data = load_request_body(request)
+    previous_questions = data.get('previous_questions') or []
     quiz_category = data.get('quiz_category')
+    if not isinstance(quiz_category, dict) or not isinstance(previous_questions, list):
+      abort(400)
+    if not all(isinstance(question_id, int) for question_id in previous_questions):
+      abort(400)
     category_id = quiz_category.get('id')
-    if category_id != 0:
-      questions = Question.query.filter(
-        Question.category == category_id,
-        ~Question.id.in_(previous_questions)
-      )
+    if category_id != 0 and len(previous_questions) <= QUIZ_SET_GATE_SIZE:
+      question_ids = bakery(lambda session: session.query(Question.id))
+      question_ids += lambda q: q.filter(Question.category == bindparam('category_id'))
+      previous = set(previous_questions)
+      candidates = [
+        row.id for row in question_ids(db.session()).params(category_id=category_id)
+        if row.id not in previous
+      ]
+      question = Question.query.get(random.choice(candidates)) if candidates else None
     else:
-      questions = Question.query.filter(
-        ~Question.id.in_(previous_questions)
+      questions = bakery(lambda session: session.query(Question))
+      questions += lambda q: q.filter(
+        ~Question.id.in_(bindparam('previous_questions', expanding=True))
       )
-    question = questions.first()
+      if category_id != 0:
+        questions += lambda q: q.filter(Question.category == bindparam('category_id'))
+      questions += lambda q: q.order_by(func.random()).limit(1)
+      question = questions(db.session()).params(
+        previous_questions=previous_questions,
+        category_id=category_id
+      ).one_or_none()
     if not question:
       # No questions left for given quiz category
-      return jsonify({
-        'success': True
-      })
+      return ojsonify(success=True)
     else:
-      return jsonify({
-        'success': True,
-        'question': question.format()
-      })
+      return ojsonify(
+        success=True,
+        question=question.format()
+      )
 
   '''
   Error handlers for all expected errors 
   '''
   @app.errorhandler(404)
   def not_found(error):
-    return jsonify({
-      "success": False, 
-      "error": 404,
-      "message": "resource not found"
-    }), 404
+    return ojsonify(
+      success=False,
+      error=404,
+      message="resource not found"
+    ), 404
 
   @app.errorhandler(422)
   def unprocessable(error):
-    return jsonify({
-      "success": False, 
-      "error": 422,
-      "message": "unprocessable"
-    }), 422
+    return ojsonify(
+      success=False,
+      error=422,
+      message="unprocessable"
+    ), 422
 
   @app.errorhandler(400)
   def bad_request(error):
-    return jsonify({
-      "success": False, 
-      "error": 400,
-      "message": "bad request"
-    }), 400
+    return ojsonify(
+      success=False,
+      error=400,
+      message="bad request"
+    ), 400
     
   return app
 
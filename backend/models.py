@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy.engine.url import make_url
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -15,6 +16,16 @@ setup_db(app)
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # sqlite uses NullPool/SingletonThreadPool, which reject pool sizing
+    if make_url(database_path).get_backend_name() != "sqlite":
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "pool_size": 20,
+            "max_overflow": 10,
+            "pool_pre_ping": True,
+            "pool_recycle": 1800
+        }
+    else:
+        app.config.pop("SQLALCHEMY_ENGINE_OPTIONS", None)
     db.app = app
     db.init_app(app)
     db.create_all()
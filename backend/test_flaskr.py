@@ -1,6 +1,7 @@
 import os
 import unittest
 import json
+from unittest import mock
 from flask_sqlalchemy import SQLAlchemy
 from flaskr import create_app
 from models import setup_db, Question, Category
@@ -51,6 +52,20 @@ class TriviaTestCase(unittest.TestCase):
         self.assertIsInstance(data['questions'], list)
         self.assertLessEqual(len(data['questions']), 10)
 
+    def test_total_questions_follows_adding_and_deleting(self):
+        total = lambda: json.loads(self.client().get('/questions').data)['total_questions']
+        before = total()
+        self.client().post(
+            '/questions',
+            data=json.dumps(self.sample_question),
+            content_type='application/json')
+        self.assertEqual(total(), before + 1)
+
+        with self.app.app_context():
+            new_id = Question.query.order_by(Question.id.desc()).first().id
+        self.client().delete('/questions/{}'.format(new_id))
+        self.assertEqual(total(), before)
+
     def test_404_requesting_non_exsistent_pages(self):
         res = self.client().get('/questions?page=100')
         data = json.loads(res.data)
@@ -58,6 +73,25 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertEqual(data['message'], 'resource not found')
     
+    def test_page_below_one_returns_first_page(self):
+        res = self.client().get('/questions?page=0')
+        data = json.loads(res.data)
+        first_page = json.loads(self.client().get('/questions').data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['questions'], first_page['questions'])
+
+    def test_get_category_questions_reports_category_total(self):
+        res = self.client().get('/categories/4/questions')
+        data = json.loads(res.data)
+        with self.app.app_context():
+            category_total = Question.query.filter(Question.category == 4).count()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['current_category'], 4)
+        self.assertEqual(data['total_questions'], category_total)
+        for question in data['questions']:
+            self.assertEqual(str(question['category']), '4')
+
     def test_deleting_question(self):
         res = self.client().delete('/questions/21')
         data = json.loads(res.data)
@@ -89,6 +123,152 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertEqual(data['message'], 'bad request')
 
+    def test_search_questions(self):
+        res = self.client().post(
+            '/search',
+            data=json.dumps({'searchTerm': 'TITLE'}),
+            content_type='application/json')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(data['questions'])
+        for question in data['questions']:
+            self.assertIn('title', question['question'].lower())
+
+    def test_play_quiz_skips_previous_questions(self):
+        res = self.client().post(
+            '/quizzes',
+            data=json.dumps({
+                'previous_questions': [5, 9],
+                'quiz_category': {'type': 'History', 'id': 4}
+            }),
+            content_type='application/json')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertNotIn(data['question']['id'], [5, 9])
+        self.assertEqual(str(data['question']['category']), '4')
+
+    def test_search_reflects_added_and_deleted_questions(self):
+        search = lambda: json.loads(self.client().post(
+            '/search',
+            data=json.dumps({'searchTerm': 'founder of apple'}),
+            content_type='application/json').data)
+        before = search()
+        self.client().post(
+            '/questions',
+            data=json.dumps(self.sample_question),
+            content_type='application/json')
+        after_insert = search()
+        self.assertEqual(after_insert['total_questions'], before['total_questions'] + 1)
+        self.assertEqual(search(), after_insert)
+
+        new_id = max(question['id'] for question in after_insert['questions'])
+        self.client().delete('/questions/{}'.format(new_id))
+        after_delete = search()
+        self.assertEqual(after_delete['total_questions'], before['total_questions'])
+        self.assertNotIn(new_id, [question['id'] for question in after_delete['questions']])
+
+    def test_search_results_expire_after_writes_from_elsewhere(self):
+        search = lambda: json.loads(self.client().post(
+            '/search',
+            data=json.dumps({'searchTerm': 'founder of apple'}),
+            content_type='application/json').data)
+        with mock.patch('flaskr.time.monotonic', return_value=1000.0):
+            before = search()
+        # a write through the models (as another worker would) does not clear this app's index
+        with self.app.app_context():
+            question = Question(**self.sample_question)
+            question.insert()
+            new_id = question.id
+        with mock.patch('flaskr.time.monotonic', return_value=1001.0):
+            self.assertEqual(search(), before)
+        with mock.patch('flaskr.time.monotonic', return_value=1100.0):
+            after = search()
+        self.assertEqual(after['total_questions'], before['total_questions'] + 1)
+        self.client().delete('/questions/{}'.format(new_id))
+
+    def test_search_with_blank_term_returns_no_questions(self):
+        res = self.client().post(
+            '/search',
+            data=json.dumps({'searchTerm': '   '}),
+            content_type='application/json')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['questions'], [])
+        self.assertEqual(data['total_questions'], 0)
+
+    def test_play_quiz_in_all_categories(self):
+        res = self.client().post(
+            '/quizzes',
+            data=json.dumps({
+                'previous_questions': [],
+                'quiz_category': {'type': 'click', 'id': 0}
+            }),
+            content_type='application/json')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(data['question'])
+
+    def test_play_quiz_with_long_previous_questions(self):
+        previous_questions = list(range(1, 23))
+        res = self.client().post(
+            '/quizzes',
+            data=json.dumps({
+                'previous_questions': previous_questions,
+                'quiz_category': {'type': 'click', 'id': 0}
+            }),
+            content_type='application/json')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertNotIn(data['question']['id'], previous_questions)
+
+    def test_play_quiz_with_long_previous_questions_in_category(self):
+        previous_questions = [5, 9, 12] + list(range(100, 120))
+        res = self.client().post(
+            '/quizzes',
+            data=json.dumps({
+                'previous_questions': previous_questions,
+                'quiz_category': {'type': 'History', 'id': 4}
+            }),
+            content_type='application/json')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertNotIn(data['question']['id'], previous_questions)
+        self.assertEqual(str(data['question']['category']), '4')
+
+    def test_400_searching_with_non_string_term(self):
+        res = self.client().post(
+            '/search',
+            data=json.dumps({'searchTerm': 5}),
+            content_type='application/json')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'bad request')
+
+    def test_400_searching_with_non_object_body(self):
+        res = self.client().post(
+            '/search',
+            data=json.dumps(['title']),
+            content_type='application/json')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['message'], 'bad request')
+
+    def test_400_playing_quiz_without_sending_body(self):
+        res = self.client().post(
+            '/quizzes',
+            content_type='application/json')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'bad request')
+
 # Make the tests conveniently executable
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
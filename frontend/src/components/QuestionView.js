@@ -14,6 +14,7 @@ class QuestionView extends Component {
       totalQuestions: 0,
       categories: {},
       currentCategory: null,
+      searchTerm: null,
     }
   }
 
@@ -30,7 +31,8 @@ class QuestionView extends Component {
           questions: result.questions,
           totalQuestions: result.total_questions,
           categories: result.categories,
-          currentCategory: result.current_category })
+          currentCategory: result.current_category,
+          searchTerm: null })
         return;
       },
       error: (error) => {
@@ -41,7 +43,15 @@ class QuestionView extends Component {
   }
 
   selectPage(num) {
-    this.setState({page: num}, () => this.getQuestions());
+    // page through whichever listing is on screen: search results,
+    // a single category, or all questions
+    if (this.state.searchTerm !== null) {
+      this.submitSearch(this.state.searchTerm, num);
+    } else if (this.state.currentCategory !== null) {
+      this.getByCategory(this.state.currentCategory, num);
+    } else {
+      this.setState({page: num}, () => this.getQuestions());
+    }
   }
 
   createPagination(){
@@ -58,15 +68,17 @@ class QuestionView extends Component {
     return pageNumbers;
   }
 
-  getByCategory= (id) => {
+  getByCategory= (id, page = 1) => {
     $.ajax({
-      url: `/categories/${id}/questions`,
+      url: `/categories/${id}/questions?page=${page}`,
       type: "GET",
       success: (result) => {
         this.setState({
           questions: result.questions,
+          page: page,
           totalQuestions: result.total_questions,
-          currentCategory: result.current_category })
+          currentCategory: result.current_category,
+          searchTerm: null })
         return;
       },
       error: (error) => {
@@ -76,9 +88,9 @@ class QuestionView extends Component {
     })
   }
 
-  submitSearch = (searchTerm) => {
+  submitSearch = (searchTerm, page = 1) => {
     $.ajax({
-      url: `/search`,
+      url: `/search?page=${page}`,
       type: "POST",
       dataType: 'json',
       contentType: 'application/json',
@@ -90,8 +102,10 @@ class QuestionView extends Component {
       success: (result) => {
         this.setState({
           questions: result.questions,
+          page: page,
           totalQuestions: result.total_questions,
-          currentCategory: result.current_category })
+          currentCategory: result.current_category,
+          searchTerm: searchTerm })
         return;
       },
       error: (error) => {
@@ -123,7 +137,7 @@ class QuestionView extends Component {
     return (
       <div className="question-view">
         <div className="categories-list">
-          <h2 onClick={() => {this.getQuestions()}}>Categories</h2>
+          <h2 onClick={() => {this.setState({page: 1}, () => this.getQuestions())}}>Categories</h2>
           <ul>
             {Object.keys(this.state.categories).map((id, ) => (
               <li key={id} onClick={() => {this.getByCategory(id)}}>